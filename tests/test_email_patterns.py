@@ -0,0 +1,155 @@
+"""
+Checks for the email extraction patterns in parse_email_inquiry.
+
+The patterns were fused into single alternations, run on the lowercased
+email and compiled with the regex module when it is installed. These tests
+compare them against the original per-pattern implementation on random
+inputs, and check that hostile whitespace-heavy inputs parse in linear time.
+
+Run with: python -m unittest discover tests
+"""
+
+import random
+import re
+import time
+import unittest
+
+from trade_surveillance_mcp.server import _parse_email_inquiry_cached
+
+
+def _reference_extract(email_content: str) -> dict:
+    """
+    The original extraction code of parse_email_inquiry, one pattern at a time.
+    
+    Dates follow the intended change made when the date patterns were fused:
+    the first date in the text wins and is returned whole ("March 5, 2024"
+    rather than the captured month "Mar").
+    """
+    content_lower = email_content.lower()
+    
+    trade_id_patterns = [
+        r'\bTRD[\-_]?\d{5,10}\b',
+        r'\bTRADE[\-_]?\d{5,10}\b',
+        r'\bT[\-_]\d{5,10}\b',
+        r'#\d{5,10}\b',
+        r'\btrade\s+(?:id|number|ref)[\s:]+(\d{5,10})\b'
+    ]
+    trade_ids = []
+    for pattern in trade_id_patterns:
+        trade_ids.extend(re.findall(pattern, email_content, re.IGNORECASE))
+    
+    account_patterns = [
+        r'\bACC(?:T)?[\-_]?\d{5,10}\b',
+        r'\baccount[\s:]+(\d{5,10})\b'
+    ]
+    account_numbers = []
+    for pattern in account_patterns:
+        account_numbers.extend(re.findall(pattern, email_content, re.IGNORECASE))
+    
+    date_patterns = [
+        r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b',
+        r'\b(\d{4}[-/]\d{1,2}[-/]\d{1,2})\b',
+        r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2},?\s+\d{4}\b',
+        r'\b\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4}\b'
+    ]
+    # Earliest match in the text; at the same position the first pattern wins
+    first_dates = []
+    for order, pattern in enumerate(date_patterns):
+        match = re.search(pattern, email_content, re.IGNORECASE)
+        if match:
+            first_dates.append((match.start(), order, match.group(0)))
+    dates_found = [min(first_dates)[2]] if first_dates else []
+    
+    time_period = None
+    if 'last week' in content_lower or 'past week' in content_lower:
+        time_period = "last_week"
+    elif 'last month' in content_lower or 'past month' in content_lower:
+        time_period = "last_month"
+    elif 'yesterday' in content_lower:
+        time_period = "yesterday"
+    elif 'today' in content_lower or 'this morning' in content_lower:
+        time_period = "today"
+    elif 'last 7 days' in content_lower or 'past 7 days' in content_lower:
+        time_period = "last_7_days"
+    elif 'last 30 days' in content_lower or 'past 30 days' in content_lower:
+        time_period = "last_30_days"
+    elif dates_found:
+        time_period = dates_found[0]
+    
+    return {
+        "trade_ids": sorted(set(trade_ids)),
+        "account_numbers": sorted(set(account_numbers)),
+        "time_period": time_period
+    }
+
+
+def _extract(email_content: str) -> dict:
+    """The same fields from the current parser."""
+    result = _parse_email_inquiry_cached(email_content)
+    return {
+        "trade_ids": sorted(result["trade_ids"]),
+        "account_numbers": sorted(result["account_numbers"]),
+        "time_period": result["time_period"]
+    }
+
+
+# Fragments random emails are assembled from: pattern prefixes in several
+# cases, separators, digit runs of boundary lengths and time phrases
+_TOKENS = [
+    "TRD", "TRADE", "T", "#", "trade", "Trade", "t", "id", "ref", "number",
+    "account", "ACC", "ACCT", "acct", "-", "_", ":", " ", "  ", "\t", "\n",
+    "1", "12", "2024", "01", "12345", "123456789", "12345678901", "/", ",",
+    ".", "jan", "March", "5,", "last", "past", "week", "month", "today",
+    "yesterday", "7 days", "x", "5", "31", "2024,"
+]
+
+
+class EmailPatternEquivalenceTest(unittest.TestCase):
+    """The fused patterns extract what the original patterns did."""
+    
+    def test_random_emails(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            email = "".join(rng.choice(_TOKENS) for _ in range(rng.randint(0, 30)))
+            self.assertEqual(_extract(email), _reference_extract(email), repr(email))
+    
+    def test_examples(self):
+        emails = [
+            "Please check TRD123456 and trade-654321 on account: 99887766.",
+            "Trade ID:        123456 failed for ACCT_1234567 on 03/15/2024",
+            "Need the report for March 5, 2024 (#7654321), no rush",
+            "trade ref 1234567890123 and T-12345 from 2024-01-31 last week",
+        ]
+        for email in emails:
+            self.assertEqual(_extract(email), _reference_extract(email), repr(email))
+
+
+class EmailPatternBacktrackingTest(unittest.TestCase):
+    """Long whitespace runs after a pattern prefix do not cause backtracking blow-ups."""
+    
+    # Far above the linear-time cost of these ~200 KB inputs (a few ms each)
+    TIME_LIMIT = 2.0
+    
+    def assertParsesQuickly(self, email: str):
+        start = time.perf_counter()
+        _parse_email_inquiry_cached(email)
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, self.TIME_LIMIT, f"{len(email)} characters took {elapsed:.2f} s")
+    
+    def test_long_whitespace_runs(self):
+        self.assertParsesQuickly("trade id" + " " * 200_000)
+        self.assertParsesQuickly("trade id" + " " * 200_000 + "x")
+        self.assertParsesQuickly("account" + ": " * 100_000)
+        self.assertParsesQuickly("trade id   " * 20_000)
+        self.assertParsesQuickly(("march" + " " * 50) * 4_000)
+        self.assertParsesQuickly(("5" + " " * 50 + "jan" + " " * 50) * 2_000)
+    
+    def test_mixed_whitespace_runs(self):
+        rng = random.Random(1)
+        for prefix in ("trade id", "trade number", "account", "jan", "1 feb"):
+            padding = "".join(rng.choice(" \t\n:") for _ in range(200_000))
+            self.assertParsesQuickly(prefix + padding + "1234")
+
+
+if __name__ == "__main__":
+    unittest.main()
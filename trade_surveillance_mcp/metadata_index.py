@@ -5,32 +5,322 @@ This module provides functionality to index files with metadata annotations
 so Copilot can search by keywords instead of file paths.
 """
 
+import functools
 import json
+import mmap
+import os
+import queue
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
+
+try:
+    import orjson
+except ImportError:  # optional dependency, falls back to the stdlib json module
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency, scanned directories are then not watched
+    Observer = None
+
+# Annotation patterns are compiled once and matched in a single pass per file.
+# The separator after the tag stays on its line, so an empty annotation does
+# not swallow the next one.
+_SQL_META_RE = re.compile(r'--\s*@(keywords|type|description):[ \t]*([^\n]+)', re.IGNORECASE)
+_JAVA_META_RE = re.compile(r'\*\s*@(keywords|type|description)[: \t]+([^\n]+)', re.IGNORECASE)
+_JAVA_METHOD_RE = re.compile(r'public\s+(?:static\s+)?[\w<>\[\]]+\s+(\w+)\s*\(')
+
+# Byte variant used on memory-mapped large SQL files, avoiding a full decode.
+# Java files are always decoded: method names may contain non-ASCII letters,
+# which a bytes \w does not match.
+_SQL_META_BYTES_RE = re.compile(_SQL_META_RE.pattern.encode(), re.IGNORECASE)
+
+# Separators between search terms and between searchable tokens
+_SPLIT_RE = re.compile(r'[,\s]+')
+
+# Length of the token substrings (n-grams) that search terms are looked up by
+_GRAM_SIZE = 3
+
+# Number of characters read from the top of a SQL file before looking further
+_HEADER_SIZE = 4096
+
+# Files larger than this are memory-mapped instead of read into a string
+_MMAP_THRESHOLD = 64 * 1024
+
+# File reads are I/O-bound, so scans use more workers than there are CPUs
+_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Minimum delay between index saves triggered by file system events
+_FLUSH_DELAY = 1.0
+
+# File system events are collected for this long before they are applied, so
+# a burst of events for one file (e.g. an editor's save) re-reads it once
+_EVENT_DELAY = 0.1
+
+# Index sections and the result type reported for their entries
+_SECTIONS = {
+    "sql": ("sql_configs", "sql_config"),
+    "java": ("java_classes", "java_class"),
+}
+
+
+class _WatchHandler:
+    """Watchdog event handler forwarding changes under a scanned directory to the index."""
+    
+    def __init__(self, index: "MetadataIndex", section: str, root: str, suffix: str, extractor):
+        self.index = index
+        self.section = section
+        self.root = root
+        self.suffix = suffix
+        self.extractor = extractor
+    
+    def dispatch(self, event):
+        """
+        Called by the watchdog observer thread for every file system event.
+        
+        The observer holds its own lock while dispatching, so changes are only
+        queued here and applied by the index's event thread.
+        """
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        if event.is_directory:
+            # A directory was added, moved or removed as a whole; fall back to a rescan
+            if event.event_type != "modified":
+                self.index._events.put((self, None))
+            return
+        paths = [event.src_path]
+        if event.event_type == "moved":
+            paths.append(event.dest_path)
+        for path in paths:
+            if path.endswith(self.suffix):
+                self.index._events.put((self, path))
 
 
 class MetadataIndex:
     """Index for searching files by metadata keywords instead of paths."""
     
-    def __init__(self, index_file: str = "metadata_index.json"):
+    def __init__(self, index_file: str = "metadata_index.json", watch: bool = False):
+        """
+        Args:
+            index_file: Path of the JSON file the index is cached in
+            watch: Keep scanned directories under a watchdog observer and
+                update single entries as files change (requires watchdog)
+        """
         self.index_file = Path(index_file)
-        self.index: dict[str, Any] = self._load_index()
+        # Loaded from index_file on first access (see the index property)
+        self._index: dict[str, Any] | None = None
+        # Indexed entries as parallel columns indexed by integer entry id; ids
+        # follow index order within a section, and a removed entry's slots are
+        # set to None until the next rebuild
+        self._entry_files: list[str | None] = []
+        self._entry_metadata: list[dict[str, Any] | None] = []
+        # Per section: file name -> entry id
+        self._entry_ids: dict[str, dict[str, int]] = {}
+        # Per section: searchable token -> ids of the section's entries containing it
+        self._postings: dict[str, dict[str, set[int]]] = {}
+        # N-grams: each _GRAM_SIZE-character substring of a token (or a whole
+        # shorter token) -> the tokens containing it, for substring lookups
+        self._grams: dict[str, set[str]] = {}
+        # Set when the in-memory index differs from index_file
+        self._dirty = False
+        # Bumped whenever the searchable entries change; part of the search cache key
+        self._version = 0
+        self._search_cached = functools.lru_cache(maxsize=256)(self._search_uncached)
+        # Guards the index, entries and postings; tools run scans and searches
+        # on worker threads
+        self._lock = threading.RLock()
+        # File system watching (see watch above)
+        self._watch = watch and Observer is not None
+        self._observer = None
+        # Section -> (watched directory, watchdog watch); one per section
+        self._watched: dict[str, tuple[str, Any]] = {}
+        # Section -> resolved directory it was last scanned from; events from
+        # watches of other directories are ignored
+        self._scan_roots: dict[str, str] = {}
+        # Guards the observer and _watched. Never held together with _lock
+        # taken first: the observer calls handlers under its own lock, so
+        # scheduling a watch must not wait for _lock
+        self._watch_lock = threading.Lock()
+        # (handler, changed file path or None for a rescan), queued by handlers
+        self._events: queue.Queue = queue.Queue()
+        self._flush_timer: threading.Timer | None = None
+    
+    @property
+    def index(self) -> dict[str, Any]:
+        """
+        The metadata index, loaded lazily.
+        
+        Reading index_file and building the search postings is deferred until the
+        index is first used, so constructing a MetadataIndex (e.g. at server
+        startup) does not pay for deserializing a large index.
+        """
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load_index()
+                    self._build_postings()
+        return self._index
+    
+    def load(self):
+        """Load index_file now rather than on first use (e.g. to warm up at startup)."""
+        self.index
     
     def _load_index(self) -> dict[str, Any]:
         """Load the metadata index from file."""
-        if self.index_file.exists():
+        if not self.index_file.exists():
+            return {"sql_configs": {}, "java_classes": {}}
+        if orjson is not None:
+            with open(self.index_file, 'rb') as f:
+                index = orjson.loads(f.read())
+        else:
             with open(self.index_file, 'r') as f:
-                return json.load(f)
-        return {"sql_configs": {}, "java_classes": {}}
+                index = json.load(f)
+        for section, _ in _SECTIONS.values():
+            for metadata in index.get(section, {}).values():
+                self._intern_fields(metadata)
+        return index
+    
+    @staticmethod
+    def _intern_fields(metadata: dict[str, Any]):
+        """Intern the keyword and type strings, which repeat across many entries."""
+        metadata["keywords"] = [sys.intern(k) for k in metadata.get("keywords") or []]
+        if metadata.get("type"):
+            metadata["type"] = sys.intern(metadata["type"])
     
     def _save_index(self):
-        """Save the metadata index to file."""
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+        """
+        Save the metadata index to file if it changed since the last save.
+        
+        The index is written to a temporary file first and then moved over
+        index_file, so readers never see a partially written index.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_file = self.index_file.with_suffix('.tmp')
+            if orjson is not None:
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps(self.index, option=orjson.OPT_INDENT_2))
+            else:
+                with open(tmp_file, 'w') as f:
+                    json.dump(self.index, f, indent=2)
+            os.replace(tmp_file, self.index_file)
+            self._dirty = False
+    
+    def flush(self):
+        """Write pending index changes to disk (no-op if nothing changed)."""
+        self._save_index()
+    
+    def _update_section(self, section: str, entries: dict[str, Any], save: bool):
+        """Replace an index section, rebuilding the postings and saving only if it changed."""
+        with self._lock:
+            if self.index.get(section) != entries:
+                self.index[section] = entries
+                self._build_postings()
+                self._dirty = True
+        if save:
+            self._save_index()
+    
+    def flush_on_idle(self):
+        """Schedule a save of pending changes, coalescing saves to at most one per _FLUSH_DELAY."""
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(_FLUSH_DELAY, self._flush_timer_fired)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _flush_timer_fired(self):
+        with self._lock:
+            self._flush_timer = None
+        self._save_index()
+    
+    def _start_watching(self, section: str, suffix: str, extractor):
+        """
+        Watch the directory a section was last scanned from for changes.
+        
+        Each section is watched in one directory only: scanning it from another
+        directory unschedules the previous watch, and events already queued for
+        it are ignored. Must not be called with _lock held (see _watch_lock).
+        """
+        if not self._watch:
+            return
+        with self._watch_lock:
+            with self._lock:
+                root = self._scan_roots.get(section)
+            current = self._watched.get(section)
+            if root is None or (current is not None and current[0] == root):
+                return
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+                threading.Thread(target=self._apply_events, name="metadata-index-events", daemon=True).start()
+            if current is not None:
+                self._observer.unschedule(current[1])
+            handler = _WatchHandler(self, section, root, suffix, extractor)
+            watch = self._observer.schedule(handler, root, recursive=True)
+            self._watched[section] = (root, watch)
+    
+    def _apply_events(self):
+        """Apply queued file system events (runs on a background thread while watching)."""
+        while True:
+            pending = {self._events.get(): None}
+            # Collect the rest of the burst, dropping repeated events for a file
+            deadline = time.monotonic() + _EVENT_DELAY
+            while (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    pending[self._events.get(timeout=timeout)] = None
+                except queue.Empty:
+                    break
+            for handler, path in pending:
+                try:
+                    if path is None:
+                        self._rescan_section(handler.section, handler.root, handler.suffix, handler.extractor, handler)
+                    else:
+                        self._refresh_file(handler.section, handler.root, path, handler.extractor, handler)
+                except Exception:
+                    pass  # keep watching; the next scan or search revalidates the entry
     
-    def scan_sql_configs(self, config_dir: str) -> dict[str, Any]:
+    def _refresh_file(self, section: str, root: str, path: str, extractor, handler: _WatchHandler | None = None):
+        """
+        Re-extract (or drop) the entry of a single created, modified or deleted file.
+        
+        handler is the watch handler reporting the change, if any; the change is
+        ignored if the section has since been scanned from another directory.
+        """
+        key = os.path.relpath(path, root)
+        metadata = None
+        try:
+            st = os.stat(path)
+        except OSError:
+            pass  # deleted (or moved away)
+        else:
+            metadata = extractor(Path(path))
+            if metadata:
+                metadata["_stat"] = [st.st_mtime_ns, st.st_size]
+        with self._lock:
+            if handler is not None and self._scan_roots.get(section) != handler.root:
+                return
+            self._update_entry(section, key, metadata)
+        self.flush_on_idle()
+    
+    def _rescan_section(self, section: str, root: str, suffix: str, extractor, handler: _WatchHandler):
+        """Rescan a watched directory after a directory was added, moved or deleted."""
+        entries = {}
+        if os.path.isdir(root):
+            entries = self._scan_files(Path(root), suffix, extractor, self.index.get(section, {}))
+        with self._lock:
+            if self._scan_roots.get(section) != handler.root:
+                return
+            self._update_section(section, entries, save=False)
+        self.flush_on_idle()
+    
+    def scan_sql_configs(self, config_dir: str, save: bool = True) -> dict[str, Any]:
         """
         Scan SQL config files and extract metadata from comments.
         
@@ -38,21 +328,91 @@ class MetadataIndex:
         -- @keywords: trade, transaction, daily_report
         -- @type: compliance_check
         -- @description: Daily trade reconciliation report
+        
+        Pass save=False to batch several scans and write once with flush().
         """
         config_path = Path(config_dir)
         if not config_path.exists():
             return {}
         
-        configs = {}
-        for sql_file in config_path.rglob("*.sql"):
-            metadata = self._extract_sql_metadata(sql_file)
-            if metadata:
-                configs[str(sql_file.relative_to(config_path))] = metadata
+        configs = self._scan_files(
+            config_path, ".sql", self._extract_sql_metadata, self.index.get("sql_configs", {})
+        )
         
-        self.index["sql_configs"] = configs
-        self._save_index()
+        with self._lock:
+            self._update_section("sql_configs", configs, save=False)
+            self._scan_roots["sql_configs"] = str(config_path.resolve())
+        self._start_watching("sql_configs", ".sql", self._extract_sql_metadata)
+        if save:
+            self._save_index()
         return configs
     
+    @staticmethod
+    def _iter_files(root: str, suffix: str) -> Iterator[os.DirEntry]:
+        """
+        Yield directory entries of files under root whose name ends with suffix.
+        
+        Directories that cannot be read (or vanish during the walk) are skipped,
+        like Path.rglob does.
+        """
+        stack = [root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(suffix) and entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+    
+    def _scan_files(
+        self,
+        root: Path,
+        suffix: str,
+        extractor: Callable[[Path], dict[str, Any] | None],
+        cached: dict[str, Any]
+    ) -> dict[str, Any]:
+        """
+        Extract metadata for every file under root whose name ends with suffix.
+        
+        Entries in cached whose recorded (mtime_ns, size) still matches the file
+        on disk are reused as-is; only new or modified files are re-read. Files
+        that no longer exist simply drop out of the result.
+        """
+        root_dir = str(root)
+        prefix_len = len(os.path.join(root_dir, ""))
+        results = {}
+        stale = []
+        for dir_entry in self._iter_files(root_dir, suffix):
+            key = dir_entry.path[prefix_len:]
+            try:
+                st = dir_entry.stat()
+            except OSError:
+                continue  # removed since it was listed
+            file_stat = [st.st_mtime_ns, st.st_size]
+            entry = cached.get(key)
+            # Extractors record file_path as str(Path(...)), which drops e.g. a leading "./"
+            if entry and entry.get("_stat") == file_stat and entry.get("file_path") == str(Path(dir_entry.path)):
+                results[key] = entry
+            else:
+                stale.append((key, Path(dir_entry.path), file_stat))
+        
+        if stale:
+            with ThreadPoolExecutor(max_workers=_SCAN_WORKERS) as executor:
+                extracted = executor.map(extractor, [file_path for _, file_path, _ in stale])
+                for (key, _, file_stat), metadata in zip(stale, extracted):
+                    if metadata:
+                        metadata["_stat"] = file_stat
+                        results[key] = metadata
+        
+        return results
+    
     def _extract_sql_metadata(self, file_path: Path) -> dict[str, Any]:
         """Extract metadata from SQL file comments."""
         metadata = {
@@ -65,29 +425,50 @@ class MetadataIndex:
         
         try:
             with open(file_path, 'r') as f:
-                content = f.read()
-            
-            # Extract @keywords
-            keywords_match = re.search(r'--\s*@keywords:\s*([^\n]+)', content, re.IGNORECASE)
-            if keywords_match:
-                keywords = [k.strip() for k in keywords_match.group(1).split(',')]
-                metadata["keywords"] = keywords
-            
-            # Extract @type
-            type_match = re.search(r'--\s*@type:\s*([^\n]+)', content, re.IGNORECASE)
-            if type_match:
-                metadata["type"] = type_match.group(1).strip()
-            
-            # Extract @description
-            desc_match = re.search(r'--\s*@description:\s*([^\n]+)', content, re.IGNORECASE)
-            if desc_match:
-                metadata["description"] = desc_match.group(1).strip()
+                # Annotations live in the header; only read the rest if it has
+                # no keywords or type (a header @description alone is not enough)
+                content = f.read(_HEADER_SIZE) + f.readline()
+                self._apply_annotations(metadata, _SQL_META_RE.finditer(content))
+                if not (metadata["keywords"] or metadata["type"]):
+                    if os.fstat(f.fileno()).st_size > _MMAP_THRESHOLD:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                            self._apply_annotations(metadata, _SQL_META_BYTES_RE.finditer(mapped))
+                    else:
+                        content += f.read()
+                        self._apply_annotations(metadata, _SQL_META_RE.finditer(content))
             
-            return metadata if metadata["keywords"] or metadata["type"] else None
+            if not (metadata["keywords"] or metadata["type"]):
+                return None
+            metadata["_search_blob"] = self._search_blob(metadata)
+            return metadata
         except Exception:
             return None
     
-    def scan_java_classes(self, code_dir: str) -> dict[str, Any]:
+    @staticmethod
+    def _apply_annotations(metadata: dict[str, Any], matches) -> None:
+        """
+        Fill keywords/type/description from annotation matches (first occurrence wins).
+        
+        Matches may come from str or bytes patterns; bytes are decoded as UTF-8.
+        """
+        seen = set()
+        for match in matches:
+            key, value = match.group(1, 2)
+            if isinstance(value, bytes):
+                key = key.decode('ascii')
+                value = value.decode('utf-8', 'replace')
+            key = key.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            if key == "keywords":
+                metadata["keywords"] = [sys.intern(k.strip()) for k in value.split(',')]
+            elif key == "type":
+                metadata["type"] = sys.intern(value.strip())
+            else:
+                metadata[key] = value.strip()
+    
+    def scan_java_classes(self, code_dir: str, save: bool = True) -> dict[str, Any]:
         """
         Scan Java files and extract metadata from javadoc comments.
         
@@ -97,19 +478,23 @@ class MetadataIndex:
          * @type report_engine
          * @description Generates daily settlement reports
          */
+        
+        Pass save=False to batch several scans and write once with flush().
         """
         code_path = Path(code_dir)
         if not code_path.exists():
             return {}
         
-        classes = {}
-        for java_file in code_path.rglob("*.java"):
-            metadata = self._extract_java_metadata(java_file)
-            if metadata:
-                classes[str(java_file.relative_to(code_path))] = metadata
+        classes = self._scan_files(
+            code_path, ".java", self._extract_java_metadata, self.index.get("java_classes", {})
+        )
         
-        self.index["java_classes"] = classes
-        self._save_index()
+        with self._lock:
+            self._update_section("java_classes", classes, save=False)
+            self._scan_roots["java_classes"] = str(code_path.resolve())
+        self._start_watching("java_classes", ".java", self._extract_java_metadata)
+        if save:
+            self._save_index()
         return classes
     
     def _extract_java_metadata(self, file_path: Path) -> dict[str, Any]:
@@ -127,77 +512,270 @@ class MetadataIndex:
         try:
             with open(file_path, 'r') as f:
                 content = f.read()
-            
-            # Extract @keywords
-            keywords_match = re.search(r'\*\s*@keywords[:\s]+([^\n]+)', content, re.IGNORECASE)
-            if keywords_match:
-                keywords = [k.strip() for k in keywords_match.group(1).split(',')]
-                metadata["keywords"] = keywords
-            
-            # Extract @type
-            type_match = re.search(r'\*\s*@type[:\s]+([^\n]+)', content, re.IGNORECASE)
-            if type_match:
-                metadata["type"] = type_match.group(1).strip()
-            
-            # Extract @description
-            desc_match = re.search(r'\*\s*@description[:\s]+([^\n]+)', content, re.IGNORECASE)
-            if desc_match:
-                metadata["description"] = desc_match.group(1).strip()
-            
+            self._apply_annotations(metadata, _JAVA_META_RE.finditer(content))
             # Extract public methods
-            method_pattern = r'public\s+(?:static\s+)?[\w<>\[\]]+\s+(\w+)\s*\('
-            methods = re.findall(method_pattern, content)
-            metadata["methods"] = methods
+            metadata["methods"] = _JAVA_METHOD_RE.findall(content)
             
-            return metadata if metadata["keywords"] or metadata["type"] else None
+            if not (metadata["keywords"] or metadata["type"]):
+                return None
+            metadata["_search_blob"] = self._search_blob(metadata)
+            return metadata
         except Exception:
             return None
     
+    def _build_postings(self):
+        """Rebuild the entries and token postings from the current index."""
+        self._entry_files = []
+        self._entry_metadata = []
+        self._entry_ids = {}
+        self._postings = {}
+        self._grams = {}
+        for section, _ in _SECTIONS.values():
+            self._entry_ids[section] = {}
+            self._postings[section] = {}
+            for file_name, metadata in self.index.get(section, {}).items():
+                self._add_entry(section, file_name, metadata)
+        self._version += 1
+    
+    def _add_entry(self, section: str, file_name: str, metadata: dict[str, Any]):
+        """Add an entry under a new id (after every entry indexed so far)."""
+        entry_id = len(self._entry_files)
+        self._entry_files.append(file_name)
+        self._entry_metadata.append(metadata)
+        self._entry_ids[section][file_name] = entry_id
+        self._add_postings(section, entry_id, metadata)
+    
+    def _indexed_elsewhere(self, section: str, token: str) -> bool:
+        """Whether another section's postings hold token (and so its n-grams are indexed)."""
+        return any(token in postings for other, postings in self._postings.items() if other != section)
+    
+    def _add_postings(self, section: str, entry_id: int, metadata: dict[str, Any]):
+        """Add an entry's id to the section postings of its tokens, indexing new tokens' n-grams."""
+        postings = self._postings[section]
+        for token in self._searchable_tokens(metadata):
+            entry_ids = postings.get(token)
+            if entry_ids is None:
+                if not self._indexed_elsewhere(section, token):
+                    for gram in self._token_grams(token):
+                        self._grams.setdefault(gram, set()).add(token)
+                entry_ids = postings[token] = set()
+            entry_ids.add(entry_id)
+    
+    def _discard_postings(self, section: str, entry_id: int):
+        """Remove an entry's id from the section postings of its tokens."""
+        postings = self._postings[section]
+        for token in self._searchable_tokens(self._entry_metadata[entry_id]):
+            entry_ids = postings.get(token)
+            if entry_ids is not None:
+                entry_ids.discard(entry_id)
+                if not entry_ids:
+                    del postings[token]
+                    if self._indexed_elsewhere(section, token):
+                        continue
+                    for gram in self._token_grams(token):
+                        tokens = self._grams[gram]
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._grams[gram]
+    
+    @staticmethod
+    def _token_grams(token: str) -> set[str]:
+        """The n-grams a token is indexed under (the token itself if it is shorter)."""
+        if len(token) <= _GRAM_SIZE:
+            return {token}
+        return {token[i:i + _GRAM_SIZE] for i in range(len(token) - _GRAM_SIZE + 1)}
+    
+    def _matching_tokens(self, term: str) -> set[str]:
+        """
+        Tokens containing term as a substring, looked up through the n-grams.
+        
+        A longer term's candidates are the tokens sharing all of its n-grams,
+        which are then checked for the whole term; a term up to _GRAM_SIZE
+        characters long is matched against the distinct n-grams, whose number
+        is bounded by the alphabet rather than by the size of the index.
+        """
+        if len(term) == _GRAM_SIZE:
+            return set(self._grams.get(term, ()))
+        if len(term) < _GRAM_SIZE:
+            tokens: set[str] = set()
+            for gram, gram_tokens in self._grams.items():
+                if term in gram:
+                    tokens |= gram_tokens
+            return tokens
+        # Intersect the rarest n-grams first; a term no token contains usually
+        # stops at the first n-gram that is not indexed
+        gram_tokens = sorted((self._grams.get(gram, set()) for gram in self._token_grams(term)), key=len)
+        candidates = gram_tokens[0]
+        for tokens in gram_tokens[1:]:
+            if not candidates:
+                break
+            candidates = candidates & tokens
+        return {token for token in candidates if term in token}
+    
+    def _update_entry(self, section: str, file_name: str, metadata: dict[str, Any] | None):
+        """
+        Add, replace or (for metadata None) remove a single index entry.
+        
+        Only that entry's postings are touched. A replaced entry keeps its id
+        and position; a new one goes after the rest of its section.
+        """
+        with self._lock:
+            entries = self.index.setdefault(section, {})
+            if entries.get(file_name) == metadata:
+                return
+            entry_id = self._entry_ids[section].get(file_name)
+            if entry_id is not None:
+                self._discard_postings(section, entry_id)
+            if metadata is None:
+                del entries[file_name]
+                self._entry_files[entry_id] = None
+                self._entry_metadata[entry_id] = None
+                del self._entry_ids[section][file_name]
+            elif entry_id is None:
+                entries[file_name] = metadata
+                self._add_entry(section, file_name, metadata)
+            else:
+                entries[file_name] = metadata
+                self._entry_metadata[entry_id] = metadata
+                self._add_postings(section, entry_id, metadata)
+            self._version += 1
+            self._dirty = True
+    
+    @staticmethod
+    def _search_blob(metadata: dict[str, Any]) -> str:
+        """Lowercased text of the searchable fields (keywords, type, description, file name)."""
+        return " ".join([
+            " ".join(metadata.get("keywords") or []),
+            metadata.get("type") or "",
+            metadata.get("description") or "",
+            metadata.get("file_name") or ""
+        ]).lower()
+    
+    def _searchable_tokens(self, metadata: dict[str, Any]) -> set[str]:
+        """Tokens of an entry's search blob, computed at extraction time when available."""
+        blob = metadata.get("_search_blob")
+        if blob is None:
+            blob = self._search_blob(metadata)
+        return set(_SPLIT_RE.split(blob))
+    
     def search(self, query: str, file_type: str = "all") -> list[dict[str, Any]]:
         """
         Search the index by keywords, type, or description.
         
+        A file matches when any query term is a substring of one of its
+        searchable tokens (so "settle" finds "settlement"). Each term is
+        resolved to the tokens containing it through an index of the tokens'
+        n-grams, without scanning the whole vocabulary, and the matching
+        tokens' postings give the entries.
+        
         Args:
             query: Search terms (space or comma separated)
             file_type: "sql", "java", or "all"
         
         Returns:
             List of matching files with their metadata
+        
+        Results are cached per (query, file_type) until the index changes.
+        Matched files that changed on disk since they were indexed (e.g. while
+        the server was down) are re-read before the results are returned.
+        """
+        self.index  # make sure the index and its postings are loaded
+        results = self._search_cached(query, file_type, self._version)
+        if self._refresh_stale(results):
+            results = self._search_cached(query, file_type, self._version)
+        # Copy the dicts and their lists (keywords, methods), so callers cannot
+        # mutate the cached results or the index entries they share lists with
+        return [
+            {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+            for result in results
+        ]
+    
+    def _refresh_stale(self, results: tuple[dict[str, Any], ...]) -> bool:
         """
-        query_terms = [term.strip().lower() for term in re.split(r'[,\s]+', query)]
-        results = []
+        Re-extract (or drop) matched entries whose file's (mtime_ns, size) no
+        longer matches the recorded _stat.
         
-        # Search SQL configs
-        if file_type in ("sql", "all"):
-            for file_name, metadata in self.index.get("sql_configs", {}).items():
-                if self._matches_query(metadata, query_terms):
-                    results.append({
-                        "type": "sql_config",
-                        "file": file_name,
-                        **metadata
-                    })
+        Returns:
+            True if any entry was refreshed
+        """
+        extractors = {
+            "sql_configs": self._extract_sql_metadata,
+            "java_classes": self._extract_java_metadata
+        }
+        refreshed = False
+        for result in results:
+            # Results carry the entry's own "type", so find its section by key and path
+            key = result["file"]
+            for section, extractor in extractors.items():
+                metadata = self.index.get(section, {}).get(key)
+                if metadata is not None and metadata.get("file_path") == result.get("file_path"):
+                    break
+            else:
+                continue
+            path = metadata["file_path"]
+            try:
+                st = os.stat(path)
+                file_stat = [st.st_mtime_ns, st.st_size]
+            except OSError:
+                file_stat = None
+            if file_stat != metadata.get("_stat"):
+                # file_path is the scanned root joined with the entry key
+                self._refresh_file(section, path[:len(path) - len(key)], path, extractor)
+                refreshed = True
+        return refreshed
+    
+    def _search_uncached(self, query: str, file_type: str, version: int) -> tuple[dict[str, Any], ...]:
+        """Run a search against the postings; version only keys the result cache."""
+        query_terms = self._covering_terms(_SPLIT_RE.split(query.lower()))
+        sections = {
+            section: result_type
+            for key, (section, result_type) in _SECTIONS.items()
+            if file_type in (key, "all")
+        }
         
-        # Search Java classes
-        if file_type in ("java", "all"):
-            for file_name, metadata in self.index.get("java_classes", {}).items():
-                if self._matches_query(metadata, query_terms):
+        with self._lock:
+            tokens: set[str] = set()
+            for term in query_terms:
+                if term:
+                    tokens |= self._matching_tokens(term)
+            
+            # Postings are kept per section, so only the requested sections'
+            # entries are ever collected; ids follow index order within a section
+            results = []
+            for section, result_type in sections.items():
+                postings = self._postings[section]
+                matched: set[int] = set()
+                if "" in query_terms:
+                    matched.update(self._entry_ids[section].values())
+                for token in tokens:
+                    entry_ids = postings.get(token)
+                    if entry_ids:
+                        matched |= entry_ids
+                for entry_id in sorted(matched):
                     results.append({
-                        "type": "java_class",
-                        "file": file_name,
-                        **metadata
+                        "type": result_type,
+                        "file": self._entry_files[entry_id],
+                        **self._public_fields(self._entry_metadata[entry_id])
                     })
         
-        return results
+        return tuple(results)
     
-    def _matches_query(self, metadata: dict[str, Any], query_terms: list[str]) -> bool:
-        """Check if metadata matches any query terms."""
-        # Combine all searchable fields
-        searchable = " ".join([
-            " ".join(metadata.get("keywords", [])),
-            metadata.get("type", ""),
-            metadata.get("description", ""),
-            metadata.get("file_name", "")
-        ]).lower()
+    @staticmethod
+    def _covering_terms(terms: list[str]) -> list[str]:
+        """
+        Drop query terms that contain another query term.
         
-        # Match if any query term is found
-        return any(term in searchable for term in query_terms)
+        Any token containing "settlement" also contains "settle", so a term's
+        matches are a subset of those of every term it contains and looking
+        it up cannot add results.
+        """
+        covering: list[str] = []
+        for term in sorted(set(terms), key=len):
+            if not any(shorter in term for shorter in covering):
+                covering.append(term)
+        return covering
+    
+    @staticmethod
+    def _public_fields(metadata: dict[str, Any]) -> dict[str, Any]:
+        """Drop internal bookkeeping fields (prefixed with "_") from an index entry."""
+        return {k: v for k, v in metadata.items() if not k.startswith("_")}
@@ -10,13 +10,29 @@ This MCP server provides tools to automate trade surveillance support workflows:
 """
 
 import asyncio
+import functools
 import logging
+import os
+import re
+import string
+import threading
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from mcp.server.fastmcp import FastMCP
 from .metadata_index import MetadataIndex
 
+try:
+    import ahocorasick
+except ImportError:  # optional dependency, keyword checks fall back to substring tests
+    ahocorasick = None
+
+try:
+    import regex
+except ImportError:  # optional dependency, email patterns fall back to the re module
+    regex = None
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,155 +40,283 @@ logger = logging.getLogger(__name__)
 # Initialize FastMCP server
 mcp = FastMCP("Trade Surveillance Support")
 
-# Initialize metadata index
-metadata_index = MetadataIndex()
+# Initialize metadata index (scanned directories are watched when watchdog is installed)
+metadata_index = MetadataIndex(watch=True)
 
+# Serialize the first-call scans of each section, so the startup prewarm and a
+# search tool never both find it empty and scan different directories
+_sql_scan_lock = threading.Lock()
+_java_scan_lock = threading.Lock()
 
-@mcp.tool()
-async def parse_email_inquiry(email_content: str) -> dict[str, Any]:
+# Engine for the email extraction patterns; the regex module matches these
+# literal-heavy patterns several times faster than re on long emails
+_re_engine = regex if regex is not None else re
+
+# Email extraction patterns, compiled once at import. They are written in lowercase
+# and run case-sensitively against lowercased email text (see _findall_original).
+# Trade IDs (common patterns: TRD123456, TRADE-123456, T-123456, #123456), as one
+# alternation so the email is scanned once; "trade id: NNN" yields only the number
+_TRADE_ID_RE = _re_engine.compile(
+    r'\btrd[\-_]?\d{5,10}\b'
+    r'|\btrade[\-_]?\d{5,10}\b'
+    r'|\bt[\-_]\d{5,10}\b'
+    r'|#\d{5,10}\b'
+    r'|\btrade\s+(?:id|number|ref)[\s:]+(?P<ref>\d{5,10})\b'
+)
+
+# Account numbers (common patterns: ACC123456, ACCT-123456, Account: 123456), as one
+# alternation; "account: NNN" yields only the number
+_ACCOUNT_RE = _re_engine.compile(
+    r'\bacc(?:t)?[\-_]?\d{5,10}\b'
+    r'|\baccount[\s:]+(?P<num>\d{5,10})\b'
+)
+
+# Dates (numeric and month-name formats), matched in a single pass
+_DATE_RE = _re_engine.compile(
+    r'\b('
+    r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}'                                                   # MM/DD/YYYY or DD-MM-YYYY
+    r'|\d{4}[-/]\d{1,2}[-/]\d{1,2}'                                                    # YYYY-MM-DD
+    r'|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2},?\s+\d{4}'  # Jan 15, 2024
+    r'|\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4}'    # 15 January 2024
+    r')\b'
+)
+
+# ASCII-only lowercasing, used when str.lower() would change the text length
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Inquiry types and their keywords, in precedence order (the first type with a hit wins)
+INQUIRY_KEYWORDS = {
+    "trade_issue": ["trade error", "failed trade", "trade problem", "transaction failed", "execution issue"],
+    "report_request": ["generate report", "need report", "send report", "report for", "can you provide"],
+    "data_verification": ["verify", "check data", "confirm", "validate", "reconcile"],
+    "settlement_inquiry": ["settlement", "settle", "payment", "clearing"],
+    "compliance_check": ["compliance", "audit", "regulatory", "regulation"],
+    "position_inquiry": ["position", "holdings", "balance", "exposure"],
+    "transaction_history": ["transaction history", "trade history", "past trades", "historical"]
+}
+
+# (keyword, inquiry type) pairs flattened in precedence order, for the substring fallback
+_INQUIRY_KEYWORDS = tuple(
+    (keyword, inq_type) for inq_type, keywords in INQUIRY_KEYWORDS.items() for keyword in keywords
+)
+
+# Suggested next steps per inquiry type
+SUGGESTED_ACTIONS: dict[str, tuple[str, ...]] = {
+    "report_request": (
+        "Search for relevant report config files",
+        "Identify appropriate Java report generator",
+        "Execute report generation",
+        "Send report to requester"
+    ),
+    "trade_issue": (
+        "Search trade transaction records",
+        "Check for error logs",
+        "Verify trade details",
+        "Generate diagnostic report"
+    ),
+    "data_verification": (
+        "Query relevant data sources",
+        "Run reconciliation checks",
+        "Generate verification report"
+    ),
+    "settlement_inquiry": (
+        "Search settlement config files",
+        "Check settlement status",
+        "Generate settlement report"
+    ),
+    "compliance_check": (
+        "Search compliance config files",
+        "Run audit checks",
+        "Generate compliance report"
+    )
+}
+DEFAULT_SUGGESTED_ACTIONS = (
+    "Analyze inquiry details",
+    "Search for relevant config files",
+    "Identify appropriate action"
+)
+
+# Urgency indicators (high priority wins over low priority)
+HIGH_PRIORITY_WORDS = ["urgent", "asap", "immediately", "critical", "emergency", "high priority"]
+LOW_PRIORITY_WORDS = ["when you can", "no rush", "low priority", "whenever"]
+_HIGH_PRIORITY_RE = _re_engine.compile('|'.join(re.escape(word) for word in HIGH_PRIORITY_WORDS))
+_LOW_PRIORITY_RE = _re_engine.compile('|'.join(re.escape(word) for word in LOW_PRIORITY_WORDS))
+
+# Relative time periods and their phrases, in precedence order
+RELATIVE_TIME_PHRASES = {
+    "last_week": ["last week", "past week"],
+    "last_month": ["last month", "past month"],
+    "yesterday": ["yesterday"],
+    "today": ["today", "this morning"],
+    "last_7_days": ["last 7 days", "past 7 days"],
+    "last_30_days": ["last 30 days", "past 30 days"]
+}
+
+# Relative time phrase -> period, and a lookahead regex that finds every phrase
+# (including overlapping ones, e.g. "todayesterday") in one pass
+_RELATIVE_TIME_PERIODS = {
+    phrase: period for period, phrases in RELATIVE_TIME_PHRASES.items() for phrase in phrases
+}
+_RELATIVE_TIME_RE = _re_engine.compile(
+    '(?=(' + '|'.join(re.escape(phrase) for phrase in _RELATIVE_TIME_PERIODS) + '))'
+)
+
+
+def _build_keyword_automaton():
+    """Build an Aho-Corasick automaton tagging every keyword and phrase above."""
+    tags: dict[str, list[tuple[str, str]]] = {}
+    for inq_type, keywords in INQUIRY_KEYWORDS.items():
+        for keyword in keywords:
+            tags.setdefault(keyword, []).append(("inquiry", inq_type))
+    for word in HIGH_PRIORITY_WORDS:
+        tags.setdefault(word, []).append(("priority", "high"))
+    for word in LOW_PRIORITY_WORDS:
+        tags.setdefault(word, []).append(("priority", "low"))
+    for period, phrases in RELATIVE_TIME_PHRASES.items():
+        for phrase in phrases:
+            tags.setdefault(phrase, []).append(("time", period))
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, keyword_tags in tags.items():
+        automaton.add_word(keyword, tuple(keyword_tags))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick is not None else None
+
+
+def _classify_keywords(content_lower: str) -> tuple[str, str, str | None]:
     """
-    Parse a user inquiry email to extract key information for investigation.
+    Classify lowercased email text by keyword.
     
-    This tool analyzes email content and extracts:
-    - Inquiry type (trade issue, report request, data verification, etc.)
-    - Related trade IDs or account numbers
-    - Time period of interest
-    - Priority level
-    - Required actions
-    
-    Args:
-        email_content: The full text content of the user's inquiry email
-        
     Returns:
-        A dictionary containing parsed information including inquiry_type,
-        trade_ids, time_period, priority, and suggested_actions
+        (inquiry_type, priority, relative time period or None)
     """
-    import re
-    from datetime import datetime, timedelta
-    
-    content_lower = email_content.lower()
-    
-    # Extract trade IDs (common patterns: TRD123456, TRADE-123456, T-123456, #123456)
-    trade_id_patterns = [
-        r'\bTRD[\-_]?\d{5,10}\b',
-        r'\bTRADE[\-_]?\d{5,10}\b',
-        r'\bT[\-_]\d{5,10}\b',
-        r'#\d{5,10}\b',
-        r'\btrade\s+(?:id|number|ref)[\s:]+(\d{5,10})\b'
-    ]
-    trade_ids = []
-    for pattern in trade_id_patterns:
-        matches = re.findall(pattern, email_content, re.IGNORECASE)
-        trade_ids.extend(matches)
-    trade_ids = list(set(trade_ids))  # Remove duplicates
-    
-    # Extract account numbers (common patterns: ACC123456, ACCT-123456, Account: 123456)
-    account_patterns = [
-        r'\bACC(?:T)?[\-_]?\d{5,10}\b',
-        r'\baccount[\s:]+(\d{5,10})\b'
-    ]
-    account_numbers = []
-    for pattern in account_patterns:
-        matches = re.findall(pattern, email_content, re.IGNORECASE)
-        account_numbers.extend(matches)
-    account_numbers = list(set(account_numbers))
+    if _KEYWORD_AUTOMATON is not None:
+        # One pass over the text collects every keyword hit
+        hits = {tag for _, tags in _KEYWORD_AUTOMATON.iter(content_lower) for tag in tags}
+        inquiry_type = next(
+            (inq_type for inq_type in INQUIRY_KEYWORDS if ("inquiry", inq_type) in hits),
+            "general_inquiry"
+        )
+        if ("priority", "high") in hits:
+            priority = "high"
+        elif ("priority", "low") in hits:
+            priority = "low"
+        else:
+            priority = "medium"
+        time_period = next(
+            (period for period in RELATIVE_TIME_PHRASES if ("time", period) in hits),
+            None
+        )
+        return inquiry_type, priority, time_period
     
-    # Extract time periods (dates, ranges, relative times)
-    time_period = None
-    date_patterns = [
-        r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b',  # MM/DD/YYYY or DD-MM-YYYY
-        r'\b(\d{4}[-/]\d{1,2}[-/]\d{1,2})\b',    # YYYY-MM-DD
-        r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2},?\s+\d{4}\b',
-        r'\b\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4}\b'
-    ]
-    
-    dates_found = []
-    for pattern in date_patterns:
-        dates_found.extend(re.findall(pattern, email_content, re.IGNORECASE))
-    
-    # Check for relative time references
-    if 'last week' in content_lower or 'past week' in content_lower:
-        time_period = "last_week"
-    elif 'last month' in content_lower or 'past month' in content_lower:
-        time_period = "last_month"
-    elif 'yesterday' in content_lower:
-        time_period = "yesterday"
-    elif 'today' in content_lower or 'this morning' in content_lower:
-        time_period = "today"
-    elif 'last 7 days' in content_lower or 'past 7 days' in content_lower:
-        time_period = "last_7_days"
-    elif 'last 30 days' in content_lower or 'past 30 days' in content_lower:
-        time_period = "last_30_days"
-    elif dates_found:
-        time_period = dates_found[0] if isinstance(dates_found[0], str) else str(dates_found[0])
-    
-    # Determine inquiry type based on keywords
     inquiry_type = "general_inquiry"
-    inquiry_keywords = {
-        "trade_issue": ["trade error", "failed trade", "trade problem", "transaction failed", "execution issue"],
-        "report_request": ["generate report", "need report", "send report", "report for", "can you provide"],
-        "data_verification": ["verify", "check data", "confirm", "validate", "reconcile"],
-        "settlement_inquiry": ["settlement", "settle", "payment", "clearing"],
-        "compliance_check": ["compliance", "audit", "regulatory", "regulation"],
-        "position_inquiry": ["position", "holdings", "balance", "exposure"],
-        "transaction_history": ["transaction history", "trade history", "past trades", "historical"]
-    }
-    
-    for inq_type, keywords in inquiry_keywords.items():
-        if any(keyword in content_lower for keyword in keywords):
+    for keyword, inq_type in _INQUIRY_KEYWORDS:
+        if keyword in content_lower:
             inquiry_type = inq_type
             break
     
-    # Determine priority based on urgency indicators
     priority = "medium"
-    high_priority_words = ["urgent", "asap", "immediately", "critical", "emergency", "high priority"]
-    low_priority_words = ["when you can", "no rush", "low priority", "whenever"]
-    
-    if any(word in content_lower for word in high_priority_words):
+    if _HIGH_PRIORITY_RE.search(content_lower):
         priority = "high"
-    elif any(word in content_lower for word in low_priority_words):
+    elif _LOW_PRIORITY_RE.search(content_lower):
         priority = "low"
     
-    # Generate suggested actions based on inquiry type
-    suggested_actions = []
-    if inquiry_type == "report_request":
-        suggested_actions = [
-            "Search for relevant report config files",
-            "Identify appropriate Java report generator",
-            "Execute report generation",
-            "Send report to requester"
-        ]
-    elif inquiry_type == "trade_issue":
-        suggested_actions = [
-            "Search trade transaction records",
-            "Check for error logs",
-            "Verify trade details",
-            "Generate diagnostic report"
-        ]
-    elif inquiry_type == "data_verification":
-        suggested_actions = [
-            "Query relevant data sources",
-            "Run reconciliation checks",
-            "Generate verification report"
-        ]
-    elif inquiry_type == "settlement_inquiry":
-        suggested_actions = [
-            "Search settlement config files",
-            "Check settlement status",
-            "Generate settlement report"
-        ]
-    elif inquiry_type == "compliance_check":
-        suggested_actions = [
-            "Search compliance config files",
-            "Run audit checks",
-            "Generate compliance report"
-        ]
-    else:
-        suggested_actions = [
-            "Analyze inquiry details",
-            "Search for relevant config files",
-            "Identify appropriate action"
-        ]
+    periods_found = {_RELATIVE_TIME_PERIODS[phrase] for phrase in _RELATIVE_TIME_RE.findall(content_lower)}
+    time_period = next((period for period in RELATIVE_TIME_PHRASES if period in periods_found), None)
+    
+    return inquiry_type, priority, time_period
+
+
+def _findall_original(pattern, scan_text: str, original: str) -> list[str]:
+    """
+    Like pattern.findall(scan_text), but return the matched text from original.
+    
+    scan_text is a lowercased copy of original with the same length, so match
+    offsets line up and extracted values keep their original case.
+    """
+    group = 1 if pattern.groups else 0
+    return [original[m.start(group):m.end(group)] for m in pattern.finditer(scan_text)]
+
+
+# Response summary layout, filled in by generate_response_summary
+_SUMMARY_TEMPLATE = """\
+Trade Surveillance Support - Response Summary
+==============================================
+
+Inquiry Type: {inquiry_type}
+Priority: {priority}
+
+Actions Taken:
+- Analyzed inquiry email
+- Located {n_configs} relevant configuration files
+- Generated report: {report_path}
+
+Next Steps:
+{actions}
+
+Report Location: {report_path}
+
+Please review the generated report and let me know if you need any additional information."""
+
+
+def _parse_email_inquiry(email_content: str) -> dict[str, Any]:
+    """Parse an inquiry email (blocking; run in a worker thread)."""
+    result = _parse_email_inquiry_cached(email_content)
+    logger.info(
+        "Parsed email inquiry: %s, Priority: %s, Found %d trade IDs",
+        result['inquiry_type'], result['priority'], len(result['trade_ids'])
+    )
+    # Copy the lists too, so callers cannot mutate the cached result
+    return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_email_inquiry_cached(email_content: str) -> dict[str, Any]:
+    """Parse an inquiry email; parsing is deterministic, so results are memoized per email."""
+    if not email_content:
+        # Nothing to scan (e.g. a client probing the tool)
+        return {
+            "status": "parsed",
+            "inquiry_type": "general_inquiry",
+            "trade_ids": [],
+            "account_numbers": [],
+            "time_period": None,
+            "priority": "medium",
+            "suggested_actions": list(DEFAULT_SUGGESTED_ACTIONS),
+            "raw_content_preview": "",
+            "content_length": 0
+        }
+    
+    content_length = len(email_content)
+    content_lower = email_content.lower()
+    # Regexes need offsets that line up with the original text
+    scan_text = content_lower if len(content_lower) == content_length else email_content.translate(_ASCII_LOWER)
+    
+    # Extract trade IDs (deduplicated, in order of appearance)
+    trade_ids = list(dict.fromkeys(
+        m.group('ref') or email_content[m.start():m.end()]
+        for m in _TRADE_ID_RE.finditer(scan_text)
+    ))
+    
+    # Extract account numbers (deduplicated)
+    account_numbers = list(dict.fromkeys(
+        m.group('num') or email_content[m.start():m.end()]
+        for m in _ACCOUNT_RE.finditer(scan_text)
+    ))
+    
+    # Extract time periods (dates, ranges, relative times)
+    dates_found = _findall_original(_DATE_RE, scan_text, email_content)
+    
+    # Determine inquiry type, priority and relative time references from keywords
+    inquiry_type, priority, time_period = _classify_keywords(content_lower)
+    if time_period is None and dates_found:
+        time_period = dates_found[0]
+    
+    # Suggested actions based on inquiry type
+    suggested_actions = list(SUGGESTED_ACTIONS.get(inquiry_type, DEFAULT_SUGGESTED_ACTIONS))
     
     result = {
         "status": "parsed",
@@ -182,14 +326,74 @@ async def parse_email_inquiry(email_content: str) -> dict[str, Any]:
         "time_period": time_period,
         "priority": priority,
         "suggested_actions": suggested_actions,
-        "raw_content_preview": email_content[:300] + "..." if len(email_content) > 300 else email_content,
-        "content_length": len(email_content)
+        "raw_content_preview": email_content[:300] + "..." if content_length > 300 else email_content,
+        "content_length": content_length
     }
     
-    logger.info(f"Parsed email inquiry: {inquiry_type}, Priority: {priority}, Found {len(trade_ids)} trade IDs")
     return result
 
 
+@mcp.tool()
+async def parse_email_inquiry(email_content: str) -> dict[str, Any]:
+    """
+    Parse a user inquiry email to extract key information for investigation.
+    
+    This tool analyzes email content and extracts:
+    - Inquiry type (trade issue, report request, data verification, etc.)
+    - Related trade IDs or account numbers
+    - Time period of interest
+    - Priority level
+    - Required actions
+    
+    Args:
+        email_content: The full text content of the user's inquiry email
+        
+    Returns:
+        A dictionary containing parsed information including inquiry_type,
+        trade_ids, time_period, priority, and suggested_actions
+    """
+    return await asyncio.to_thread(_parse_email_inquiry, email_content)
+
+
+@mcp.tool()
+async def parse_email_inquiries(email_contents: list[str]) -> list[dict[str, Any]]:
+    """
+    Parse a batch of user inquiry emails (e.g. the messages of an mbox export).
+    
+    Each email is parsed exactly like parse_email_inquiry; the whole batch runs
+    in one worker thread, so the per-call overhead is paid once.
+    
+    Args:
+        email_contents: The full text content of each inquiry email
+        
+    Returns:
+        One parsed inquiry dictionary per email, in input order
+    """
+    return await asyncio.to_thread(lambda: [_parse_email_inquiry(email) for email in email_contents])
+
+
+def _ensure_sql_configs_indexed(config_directory: str):
+    """Scan SQL configs if the index has none yet (blocking; run in a worker thread)."""
+    if metadata_index.index.get("sql_configs"):
+        return
+    with _sql_scan_lock:
+        # Another thread may have scanned while we waited for the lock
+        if not metadata_index.index.get("sql_configs"):
+            logger.info("Scanning SQL configs in: %s", config_directory)
+            metadata_index.scan_sql_configs(config_directory)
+
+
+def _ensure_java_classes_indexed(code_directory: str):
+    """Scan Java classes if the index has none yet (blocking; run in a worker thread)."""
+    if metadata_index.index.get("java_classes"):
+        return
+    with _java_scan_lock:
+        # Another thread may have scanned while we waited for the lock
+        if not metadata_index.index.get("java_classes"):
+            logger.info("Scanning Java classes in: %s", code_directory)
+            metadata_index.scan_java_classes(code_directory)
+
+
 @mcp.tool()
 async def search_sql_configs(
     search_keywords: str,
@@ -212,15 +416,14 @@ async def search_sql_configs(
     Returns:
         A dictionary containing matching config files with their metadata
     """
-    logger.info(f"Searching SQL configs for keywords: {search_keywords}")
+    logger.info("Searching SQL configs for keywords: %s", search_keywords)
     
-    # Scan directory if index is empty
-    if not metadata_index.index.get("sql_configs"):
-        logger.info(f"Scanning SQL configs in: {config_directory}")
-        metadata_index.scan_sql_configs(config_directory)
+    # Index loading, scanning and searching block on file I/O, so run them
+    # off the event loop
+    await asyncio.to_thread(_ensure_sql_configs_indexed, config_directory)
     
     # Search by keywords
-    matches = metadata_index.search(search_keywords, file_type="sql")
+    matches = await asyncio.to_thread(metadata_index.search, search_keywords, "sql")
     
     result = {
         "status": "success",
@@ -229,7 +432,7 @@ async def search_sql_configs(
         "config_files": matches
     }
     
-    logger.info(f"Found {len(matches)} SQL config matches")
+    logger.info("Found %d SQL config matches", len(matches))
     return result
 
 
@@ -257,15 +460,14 @@ async def search_java_code(
     Returns:
         A dictionary containing matching Java files with their metadata and methods
     """
-    logger.info(f"Searching Java code for keywords: {search_keywords}")
+    logger.info("Searching Java code for keywords: %s", search_keywords)
     
-    # Scan directory if index is empty
-    if not metadata_index.index.get("java_classes"):
-        logger.info(f"Scanning Java classes in: {code_directory}")
-        metadata_index.scan_java_classes(code_directory)
+    # Index loading, scanning and searching block on file I/O, so run them
+    # off the event loop
+    await asyncio.to_thread(_ensure_java_classes_indexed, code_directory)
     
     # Search by keywords
-    matches = metadata_index.search(search_keywords, file_type="java")
+    matches = await asyncio.to_thread(metadata_index.search, search_keywords, "java")
     
     result = {
         "status": "success",
@@ -274,10 +476,42 @@ async def search_java_code(
         "java_classes": matches
     }
     
-    logger.info(f"Found {len(matches)} Java class matches")
+    logger.info("Found %d Java class matches", len(matches))
     return result
 
 
+# Output kept from the end of each test output stream; Maven and Gradle runs
+# can log tens of MB
+_OUTPUT_TAIL_BYTES = 256 * 1024
+
+
+async def _read_tail(stream: asyncio.StreamReader) -> str:
+    """Read a subprocess output stream to EOF, keeping only its last _OUTPUT_TAIL_BYTES."""
+    tail = bytearray()
+    truncated = False
+    while chunk := await stream.read(65536):
+        tail += chunk
+        if len(tail) > _OUTPUT_TAIL_BYTES:
+            del tail[:len(tail) - _OUTPUT_TAIL_BYTES]
+            truncated = True
+    if truncated:
+        # Start at a line boundary rather than mid-line
+        newline = tail.find(b"\n")
+        if newline != -1:
+            del tail[:newline + 1]
+    return tail.decode('utf-8', errors='replace')
+
+
+@functools.lru_cache(maxsize=None)
+def _detect_build_tool(project_root: Path) -> str:
+    """Return "maven", "gradle" or "junit" for a project; probed once per project root."""
+    if (project_root / "pom.xml").exists():
+        return "maven"
+    if (project_root / "build.gradle").exists() or (project_root / "build.gradle.kts").exists():
+        return "gradle"
+    return "junit"
+
+
 @mcp.tool()
 async def execute_java_report(
     java_class: str,
@@ -299,11 +533,6 @@ async def execute_java_report(
     Returns:
         A dictionary containing execution status, report path, and any errors
     """
-    import subprocess
-    import os
-    from datetime import datetime
-    from pathlib import Path
-    
     start_time = datetime.now()
     
     # Derive test class name (e.g., SettlementReportGenerator -> SettlementReportGeneratorTest)
@@ -340,7 +569,7 @@ async def execute_java_report(
     }
     
     try:
-        logger.info(f"Executing Java test: {test_class_full} for class: {java_class}")
+        logger.info("Executing Java test: %s for class: %s", test_class_full, java_class)
         
         # Set environment variables for the test to use
         env = os.environ.copy()
@@ -349,10 +578,9 @@ async def execute_java_report(
         
         # Determine build tool (Maven or Gradle)
         project_root = Path.cwd()
-        has_maven = (project_root / "pom.xml").exists()
-        has_gradle = (project_root / "build.gradle").exists() or (project_root / "build.gradle.kts").exists()
+        build_tool = _detect_build_tool(project_root)
         
-        if has_maven:
+        if build_tool == "maven":
             # Run Maven test for specific test class
             cmd = [
                 "mvn",
@@ -361,8 +589,8 @@ async def execute_java_report(
                 f"-DconfigFile={config_file}",
                 f"-DoutputFile={report_path}"
             ]
-            logger.info(f"Running Maven command: {' '.join(cmd)}")
-        elif has_gradle:
+            logger.info("Running Maven command: %s", ' '.join(cmd))
+        elif build_tool == "gradle":
             # Run Gradle test for specific test class
             cmd = [
                 "./gradlew",
@@ -371,7 +599,7 @@ async def execute_java_report(
                 f"-DconfigFile={config_file}",
                 f"-DoutputFile={report_path}"
             ]
-            logger.info(f"Running Gradle command: {' '.join(cmd)}")
+            logger.info("Running Gradle command: %s", ' '.join(cmd))
         else:
             # Fallback to direct JUnit execution
             cmd = [
@@ -381,7 +609,7 @@ async def execute_java_report(
                 "org.junit.runner.JUnitCore",
                 test_class_full
             ]
-            logger.info(f"Running JUnit command: {' '.join(cmd)}")
+            logger.info("Running JUnit command: %s", ' '.join(cmd))
         
         # Execute the test
         process = await asyncio.create_subprocess_exec(
@@ -392,27 +620,28 @@ async def execute_java_report(
             cwd=str(project_root)
         )
         
-        stdout, stderr = await process.communicate()
+        # Stream both outputs as they are produced, keeping only their tails
+        stdout_text, stderr_text = await asyncio.gather(
+            _read_tail(process.stdout),
+            _read_tail(process.stderr)
+        )
+        await process.wait()
         
         # Calculate execution time
         execution_time = (datetime.now() - start_time).total_seconds()
         result["execution_time"] = f"{execution_time:.2f}s"
         
-        # Process output
-        stdout_text = stdout.decode('utf-8') if stdout else ""
-        stderr_text = stderr.decode('utf-8') if stderr else ""
-        
         result["test_output"] = stdout_text
         
         if process.returncode == 0:
             result["status"] = "success"
-            logger.info(f"Test execution completed successfully in {execution_time:.2f}s")
+            logger.info("Test execution completed successfully in %.2fs", execution_time)
             
             # Verify report was created
             if report_path.exists():
                 file_size = report_path.stat().st_size
                 result["report_size"] = f"{file_size} bytes"
-                logger.info(f"Report generated: {report_path} ({file_size} bytes)")
+                logger.info("Report generated: %s (%d bytes)", report_path, file_size)
             else:
                 result["status"] = "completed_no_output"
                 result["errors"].append("Test passed but report file was not created")
@@ -422,17 +651,17 @@ async def execute_java_report(
             result["errors"].append(f"Test execution failed with exit code {process.returncode}")
             if stderr_text:
                 result["errors"].append(stderr_text)
-            logger.error(f"Test execution failed: {stderr_text}")
+            logger.error("Test execution failed: %s", stderr_text)
         
     except FileNotFoundError as e:
         result["status"] = "error"
         result["errors"].append(f"Build tool not found: {str(e)}")
         result["errors"].append("Ensure Maven (mvn) or Gradle (./gradlew) is installed and in PATH")
-        logger.error(f"Build tool not found: {e}")
+        logger.error("Build tool not found: %s", e)
     except Exception as e:
         result["status"] = "error"
         result["errors"].append(f"Unexpected error: {str(e)}")
-        logger.error(f"Unexpected error during test execution: {e}", exc_info=True)
+        logger.error("Unexpected error during test execution: %s", e, exc_info=True)
     
     return result
 
@@ -458,8 +687,11 @@ async def rebuild_metadata_index(
     """
     logger.info("Rebuilding metadata index...")
     
-    sql_count = len(metadata_index.scan_sql_configs(config_directory))
-    java_count = len(metadata_index.scan_java_classes(code_directory))
+    sql_configs = await asyncio.to_thread(metadata_index.scan_sql_configs, config_directory, False)
+    java_classes = await asyncio.to_thread(metadata_index.scan_java_classes, code_directory, False)
+    await asyncio.to_thread(metadata_index.flush)
+    sql_count = len(sql_configs)
+    java_count = len(java_classes)
     
     result = {
         "status": "success",
@@ -469,7 +701,7 @@ async def rebuild_metadata_index(
         "index_file": str(metadata_index.index_file.absolute())
     }
     
-    logger.info(f"Index rebuilt: {sql_count} SQL configs, {java_count} Java classes")
+    logger.info("Index rebuilt: %d SQL configs, %d Java classes", sql_count, java_count)
     return result
 
 
@@ -493,28 +725,36 @@ async def generate_response_summary(
     Returns:
         A formatted summary string ready to send to the user
     """
-    summary = f"""
-Trade Surveillance Support - Response Summary
-==============================================
-
-Inquiry Type: {parsed_email.get('inquiry_type', 'Unknown')}
-Priority: {parsed_email.get('priority', 'Medium')}
-
-Actions Taken:
-- Analyzed inquiry email
-- Located {len(config_files)} relevant configuration files
-- Generated report: {report_path}
-
-Next Steps:
-{chr(10).join(f"- {action}" for action in parsed_email.get('suggested_actions', []))}
+    actions = "\n".join([f"- {action}" for action in parsed_email.get('suggested_actions') or ()])
+    summary = _SUMMARY_TEMPLATE.format_map({
+        "inquiry_type": parsed_email.get('inquiry_type', 'Unknown'),
+        "priority": parsed_email.get('priority', 'Medium'),
+        "n_configs": len(config_files),
+        "report_path": report_path,
+        "actions": actions
+    })
+    
+    logger.info("Generated response summary")
+    return summary
 
-Report Location: {report_path}
 
-Please review the generated report and let me know if you need any additional information.
-"""
+def _prewarm_index():
+    """
+    Load the persisted index and run the search tools' first-call scans of
+    their default directories ahead of time (runs on a background thread at
+    startup, so the server starts serving without waiting for either).
     
-    logger.info("Generated response summary")
-    return summary.strip()
+    Sections already present in the loaded index are left alone; they may have
+    been built from other directories with rebuild_metadata_index.
+    """
+    # Warm start: load the persisted index so the first search does not pay
+    # for it; entries are re-validated against the files as searches match them
+    metadata_index.load()
+    sql_count = len(metadata_index.index.get("sql_configs", {}))
+    java_count = len(metadata_index.index.get("java_classes", {}))
+    logger.info("Loaded metadata index: %d SQL configs, %d Java classes", sql_count, java_count)
+    _ensure_sql_configs_indexed("./configs")
+    _ensure_java_classes_indexed("./src")
 
 
 def main():
@@ -522,6 +762,8 @@ def main():
     Main entry point for the Trade Surveillance MCP server.
     """
     logger.info("Starting Trade Surveillance MCP Server...")
+    # Load and refresh the index while the server waits for its first request
+    threading.Thread(target=_prewarm_index, name="prewarm-index", daemon=True).start()
     mcp.run(transport='stdio')
 
 